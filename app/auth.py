@@ -1,29 +1,162 @@
-from fastapi import APIRouter, Request, Form
-from starlette.responses import RedirectResponse
+import asyncio
+import hmac
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request, Form
+from fastapi.responses import HTMLResponse, JSONResponse
+from markupsafe import escape
+from starlette.responses import RedirectResponse
 
 auth_router = APIRouter()
 
 # ---- helpers -------------------------------------------------
 def current_user(request: Request):
     """Return user dict from session or None."""
-    return request.session.get("user")
+    user = request.session.get("user")
+    if user is not None and not isinstance(user, dict):
+        # cookie from the old login, which stored just the name; make
+        # them sign in again rather than guess a role
+        request.session.pop("user")
+        return None
+    return user
 
 def login_required(request: Request, next_path: str):
     if not current_user(request):
         return RedirectResponse(url=f"/login?next={next_path}", status_code=303)
     return None
 
-def verify_credentials(username_or_email: str, password: str):
+def require_login(request: Request):
+    """Dependency for JSON endpoints: the session user, or 401."""
+    user = current_user(request)
+    if not user:
+        raise HTTPException(status_code=401, detail="Login required")
+    return user
+
+# ---- auth backends -------------------------------------------
+# Each backend takes (login, password) and returns the session user dict
+# or None. One is picked at startup (AUTH_BACKEND=dev|env|db) and stored
+# on app.state, so the login handler makes a single direct call.
+def _authenticate_dev(login: str, password: str):
     """
-    Replace this with your real DB check if desired.
-    For now, accept 'admin' with any non-empty password so the UI works.
+    Demo backend: accept any non-empty credentials so the UI works.
     """
-    if username_or_email and password:
+    if login and password:
         # role used by templates like users.html that check for 'superadmin'
-        return {"username": username_or_email, "role": "superadmin"}
+        return {"username": login, "role": "superadmin"}
+    return None
+
+def _authenticate_env(login: str, password: str):
+    """Single admin account from ADMIN_USERNAME / ADMIN_PASSWORD."""
+    username = os.getenv("ADMIN_USERNAME", "")
+    expected = os.getenv("ADMIN_PASSWORD", "")
+    if not username or not expected:
+        return None
+    ok_user = hmac.compare_digest(login.encode(), username.encode())
+    ok_pass = hmac.compare_digest(password.encode(), expected.encode())
+    if ok_user and ok_pass:
+        return {"username": username, "role": "superadmin"}
     return None
 
+def _authenticate_db(login: str, password: str):
+    """Users table (username or email + pbkdf2 password hash)."""
+    from app.database import SessionLocal
+    from app.utils import authenticate_user
+
+    with SessionLocal() as db:
+        user = authenticate_user(db, login, password)
+        if not user or not user.is_active:
+            return None
+        return {
+            "id": user.id,
+            "username": user.username,
+            "role": getattr(user.role, "value", user.role),
+        }
+
+AUTH_BACKENDS = {
+    "dev": _authenticate_dev,
+    "env": _authenticate_env,
+    "db": _authenticate_db,
+}
+
+def configure_auth(app, backend: str | None = None) -> None:
+    name = backend or os.getenv("AUTH_BACKEND", "dev")
+    if name not in AUTH_BACKENDS:
+        raise ValueError(f"Unknown AUTH_BACKEND {name!r}; expected one of {sorted(AUTH_BACKENDS)}")
+    app.state.authenticate = AUTH_BACKENDS[name]
+
+# Password checks (PBKDF2, tens of ms) run on their own small pool: they
+# never block the event loop, and a burst of logins cannot take every
+# thread in the shared pool that sync routes run on.
+_auth_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="auth")
+
+# ---- login throttling ----------------------------------------
+LOGIN_WINDOW_SECONDS = 60
+LOGIN_MAX_FAILURES = 5
+LOGIN_TRACKED_IPS = 10_000
+
+# ip -> timestamps of failed login attempts inside the window, least
+# recently failing first; capped so clients spraying from many addresses
+# cannot grow it without bound
+_login_attempts: "OrderedDict[str, deque[float]]" = OrderedDict()
+
+def _client_ip(request: Request) -> str:
+    # interned so repeated lookups of the same address compare by identity
+    return sys.intern(request.client.host) if request.client else "unknown"
+
+def login_throttled(request: Request):
+    """
+    Return a 429 response if this client failed too many logins recently.
+    Checked before any credential lookup so abusive clients never reach
+    the password hash.
+    """
+    attempts = _login_attempts.get(_client_ip(request))
+    if not attempts:
+        return None
+    cutoff = time.monotonic() - LOGIN_WINDOW_SECONDS
+    while attempts and attempts[0] < cutoff:
+        attempts.popleft()
+    if len(attempts) >= LOGIN_MAX_FAILURES:
+        return JSONResponse(
+            status_code=429,
+            content={"error": "too many attempts"},
+            headers={"Retry-After": str(LOGIN_WINDOW_SECONDS)},
+        )
+    return None
+
+def record_failed_login(request: Request) -> None:
+    ip = _client_ip(request)
+    attempts = _login_attempts.get(ip)
+    if attempts is None:
+        attempts = _login_attempts[ip] = deque()
+        if len(_login_attempts) > LOGIN_TRACKED_IPS:
+            _login_attempts.popitem(last=False)
+    else:
+        _login_attempts.move_to_end(ip)
+    attempts.append(time.monotonic())
+
+# ---- login page ----------------------------------------------
+# The login form is identical for every visitor except the `next` field,
+# so it is rendered once (per footer year) around a marker and served as
+# bytes: year -> (html before marker, html after marker)
+_NEXT_MARKER = "__login_next__"
+_login_page_cache: dict[int, tuple[bytes, bytes]] = {}
+
+def _login_page_html(request: Request, next: str) -> HTMLResponse:
+    year = datetime.utcnow().year
+    parts = _login_page_cache.get(year)
+    if parts is None:
+        html = request.app.state.templates.get_template("login.html").render(
+            request=request, user=None, next=_NEXT_MARKER,
+        )
+        head, tail = html.split(_NEXT_MARKER)
+        parts = _login_page_cache[year] = (head.encode("utf-8"), tail.encode("utf-8"))
+    body = parts[0] + str(escape(next or "/dashboard")).encode("utf-8") + parts[1]
+    return HTMLResponse(body)
+
 # ---- routes --------------------------------------------------
 @auth_router.get("/login")
 def login_page(request: Request, next: str = "/dashboard"):
@@ -32,13 +165,10 @@ def login_page(request: Request, next: str = "/dashboard"):
     """
     if current_user(request):
         return RedirectResponse(url=next or "/dashboard", status_code=303)
-
-    # Provide 'now' as a datetime OBJECT; use {{ now.year }} in base.html
-    ctx = {"request": request, "user": None, "now": datetime.now(), "next": next}
-    return request.app.state.templates.TemplateResponse("login.html", ctx)
+    return _login_page_html(request, next)
 
 @auth_router.post("/login")
-def login_submit(
+async def login_submit(
     request: Request,
     username: str = Form(..., alias="username"),
     password: str = Form(..., alias="password"),
@@ -47,8 +177,14 @@ def login_submit(
     """
     Handle POST from login form.
     """
-    user = verify_credentials(username, password)
+    throttled = login_throttled(request)
+    if throttled:
+        return throttled
+
+    loop = asyncio.get_running_loop()
+    user = await loop.run_in_executor(_auth_pool, request.app.state.authenticate, username, password)
     if not user:
+        record_failed_login(request)
         # Simple reload; you could flash a message if you have messaging
         return RedirectResponse(url="/login?next=" + (next or "/dashboard"), status_code=303)
 
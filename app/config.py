@@ -13,6 +13,11 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./data.db"
+    # sync handlers hold a connection for the whole request, render included
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
 
     # SMTP (Microsoft 365 STARTTLS)
     SMTP_HOST: str = "smtp.office365.com"
@@ -1,13 +1,47 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.config import settings
 
+_url = make_url(settings.DATABASE_URL)
+_is_sqlite = _url.get_backend_name() == "sqlite"
+# any in-memory spelling (sqlite://, sqlite+pysqlite://, :memory:?...)
+# gets SingletonThreadPool, which takes no sizing arguments
+_is_memory = _is_sqlite and _url.database in (None, "", ":memory:")
+
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {},
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
     pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    # threaded handlers reuse pooled connections instead of reopening the file
+    **({} if _is_memory else {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }),
 )
+
+if engine.url.get_backend_name() == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _sqlite_connection_pragmas(dbapi_conn, _record):
+        # per-connection settings; WAL itself is persisted in the db file
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA foreign_keys=ON")
+        cur.execute("PRAGMA busy_timeout=5000")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA mmap_size=268435456")
+        cur.execute("PRAGMA cache_size=-16000")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+
+# INSERT construct with ON CONFLICT support (on_conflict_do_nothing /
+# on_conflict_do_update) for the configured backend
+if engine.dialect.name == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert as upsert_insert  # noqa: F401
+else:
+    from sqlalchemy.dialects.sqlite import insert as upsert_insert  # noqa: F401
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False)
 Base = declarative_base()
 
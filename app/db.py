@@ -1,14 +1,5 @@
 # app/db.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-
-# Use the project-root SQLite file 'data.db'
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data.db"
-
-# For SQLite in threads (FastAPI + Uvicorn), disable same-thread check
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# Kept for the route modules that import from here. There is one engine
+# and one session factory for the whole app: the ones in app.database
+# (pooled, expire_on_commit=False, pragmas applied per connection).
+from app.database import Base, SessionLocal, engine, get_db, upsert_insert  # noqa: F401
@@ -1,11 +1,82 @@
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from typing import Optional
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+# smtplib / email.mime are imported on first send: most workers never mail
+if TYPE_CHECKING:
+    import smtplib
 
 from app.config import settings
 
+
+class SMTPPool:
+    """
+    Keeps one authenticated SMTP connection open and reuses it for every
+    message instead of paying the TCP + STARTTLS + LOGIN handshake per send.
+    """
+    # connections idle longer than this get a NOOP before reuse
+    KEEPALIVE_SECONDS = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._server: Optional["smtplib.SMTP"] = None
+        self._last_used = 0.0
+
+    def _connect(self) -> "smtplib.SMTP":
+        import smtplib
+
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
+        server.ehlo()
+        server.starttls()
+        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return server
+
+    def _drop(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+        self._server = None
+
+    def _get(self) -> "smtplib.SMTP":
+        import smtplib
+
+        if self._server is not None and time.monotonic() - self._last_used > self.KEEPALIVE_SECONDS:
+            try:
+                if self._server.noop()[0] != 250:
+                    self._drop()
+            except (smtplib.SMTPException, OSError):
+                self._drop()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def sendmail(self, from_addr: str, to_addrs: list[str], msg: str) -> None:
+        import smtplib
+
+        with self._lock:
+            try:
+                self._get().sendmail(from_addr, to_addrs, msg)
+            except smtplib.SMTPServerDisconnected:
+                # server closed the idle connection; reconnect once
+                self._drop()
+                self._get().sendmail(from_addr, to_addrs, msg)
+            self._last_used = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
+
+
+smtp_pool = SMTPPool()
+
+
 def send_email(subject: str, to_email: str, text_body: str, html_body: Optional[str] = None) -> bool:
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = settings.SMTP_FROM
@@ -16,13 +87,46 @@ def send_email(subject: str, to_email: str, text_body: str, html_body: Optional[
         msg.attach(MIMEText(html_body, "html", "utf-8"))
 
     try:
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-            server.sendmail(settings.SMTP_FROM, [to_email], msg.as_string())
+        smtp_pool.sendmail(settings.SMTP_FROM, [to_email], msg.as_string())
         return True
     except Exception as e:
         # Log to console; you can improve with proper logging
         print("SMTP error:", e)
         return False
+
+
+# -------------------------------------------------------------------
+# Background delivery: handlers enqueue, one worker task sends
+# -------------------------------------------------------------------
+async def email_worker(queue: asyncio.Queue) -> None:
+    while True:
+        subject, to_email, text_body, html_body = await queue.get()
+        try:
+            # smtplib blocks; keep it off the event loop
+            await asyncio.to_thread(send_email, subject, to_email, text_body, html_body)
+        finally:
+            queue.task_done()
+
+
+def start_email_worker(app) -> None:
+    app.state.email_queue = asyncio.Queue()
+    app.state.email_loop = asyncio.get_running_loop()
+    app.state.email_worker = asyncio.create_task(email_worker(app.state.email_queue))
+
+
+async def stop_email_worker(app, timeout: float = 10.0) -> None:
+    try:
+        await asyncio.wait_for(app.state.email_queue.join(), timeout)
+    except asyncio.TimeoutError:
+        print("SMTP: dropping", app.state.email_queue.qsize(), "queued email(s) on shutdown")
+    app.state.email_worker.cancel()
+    smtp_pool.close()
+
+
+def enqueue_email(app, subject: str, to_email: str, text_body: str, html_body: Optional[str] = None) -> None:
+    """
+    Queue an email for the background worker and return immediately.
+    Safe to call from async handlers and from sync (threadpool) handlers.
+    """
+    item = (subject, to_email, text_body, html_body)
+    app.state.email_loop.call_soon_threadsafe(app.state.email_queue.put_nowait, item)
@@ -1,32 +1,174 @@
 # app/main.py
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+
+import anyio.to_thread
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
-from starlette.middleware.sessions import SessionMiddleware
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
 
-from .db import Base, engine
+from . import models  # noqa: F401  (registers tables on Base)
+from .auth import configure_auth
+from .config import settings
+from .database import Base, engine
+from .email_utils import start_email_worker, stop_email_worker
+from .migrations import optimize, run_migrations
+from .sessions import PureASGISessionMiddleware
 from .views import register_routes
-from .routes_contacts import router as contacts_api_router
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+TEMPLATES_DIR = BASE_DIR / "templates"
+STATIC_DIR = BASE_DIR / "static"
+# stored in the database as PRAGMA user_version; bump it when a model or
+# run_migrations() changes so existing databases are brought up to date
+SCHEMA_VERSION = 1
+OPTIMIZE_EVERY_SECONDS = 6 * 60 * 60
+
+# Starlette matches routes by scanning the list in order; the busiest
+# pages go first. All of these are fixed paths, so moving them ahead of
+# the docs routes and the /static mount cannot change what matches.
+HOT_PATHS = ("/dashboard", "/login", "/contacts", "/", "/logout")
+
+
+# [value, monotonic time it was taken]; templates only need coarse time,
+# so the clock is read at most once per second
+_now_cache = [datetime.now(), time.monotonic()]
+
+
+def _now() -> datetime:
+    t = time.monotonic()
+    if t - _now_cache[1] > 1.0:
+        _now_cache[0] = datetime.now()
+        _now_cache[1] = t
+    return _now_cache[0]
+
+
+def _schema_version() -> int:
+    if engine.dialect.name != "sqlite":
+        return 0
+    with engine.connect() as conn:
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def _ensure_schema() -> None:
+    """
+    create_all() inspects every table, so only run it when the database
+    is older than SCHEMA_VERSION (a new file has 0) or when RUN_MIGRATIONS=1
+    is set. Keeps multi-worker startup from repeating the probes.
+    """
+    if os.getenv("RUN_MIGRATIONS") != "1" and _schema_version() >= SCHEMA_VERSION:
+        return
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+async def _optimize_periodically() -> None:
+    while True:
+        await asyncio.sleep(OPTIMIZE_EVERY_SECONDS)
+        # 0x12: bounded ANALYZE, safe to run while serving traffic
+        await asyncio.to_thread(optimize, engine, 0x12)
+
+
+class HealthzMiddleware:
+    """
+    Answers /healthz directly at the ASGI layer: probes skip the session
+    middleware, routing and response classes entirely.
+    """
+    BODY = b'{"ok":true}'
+    HEADERS = [(b"content-type", b"application/json"), (b"content-length", b"11")]
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/healthz":
+            await send({"type": "http.response.start", "status": 200, "headers": self.HEADERS})
+            await send({"type": "http.response.body", "body": self.BODY})
+            return
+        await self.app(scope, receive, send)
+
+
+def _route_priority(route) -> int:
+    path = getattr(route, "path", None)
+    return HOT_PATHS.index(path) if path in HOT_PATHS else len(HOT_PATHS)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Compile every page up front so the first request doesn't pay for it;
+    # a template that does not compile stops startup here
+    env = app.state.templates.env
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+
+    # Sync handlers run in anyio's thread pool and each holds a pooled
+    # connection; size the two together so a burst waits in one place.
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+
+    # Outgoing email is sent by a background task, never inside a request
+    start_email_worker(app)
+    # Keep SQLite's planner statistics fresh
+    optimizer = asyncio.create_task(_optimize_periodically())
+    try:
+        yield
+    finally:
+        optimizer.cancel()
+        await stop_email_worker(app)
+        await asyncio.to_thread(optimize, engine)
+
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="ALIF Discount")
+    # orjson encodes straight to bytes; used for every JSON endpoint
+    app = FastAPI(title="ALIF Discount", default_response_class=ORJSONResponse, lifespan=_lifespan)
 
     # Static & Templates
-    os.makedirs("static", exist_ok=True)
-    app.mount("/static", StaticFiles(directory="static"), name="static")
-    templates = Jinja2Templates(directory="templates")
+    STATIC_DIR.mkdir(exist_ok=True)
+    app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+    # Compiled templates are cached on disk (shared by workers, survive
+    # restarts) and kept in memory; outside production edits to a template
+    # are still picked up without a restart.
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=True,
+        # no directory given: Jinja uses a per-user 0700 temp dir and checks it
+        bytecode_cache=FileSystemBytecodeCache(),
+        auto_reload=settings.ENV != "production",
+        cache_size=400,
+    )
+    templates = Jinja2Templates(env=env)
+    templates.env.globals["now"] = _now  # base.html footer: {{ now().year }}
     app.state.templates = templates  # so views.py can use it
 
     # Sessions (adjust your secret)
-    app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET", "alifdiscount-secret"))
+    app.add_middleware(
+        PureASGISessionMiddleware,
+        secret_key=os.getenv("SESSION_SECRET", "alifdiscount-secret"),
+        cookie_name="session",
+    )
+    # added last = outermost, so it runs before the session middleware
+    app.add_middleware(HealthzMiddleware)
+
+    # Credential check (AUTH_BACKEND=dev|env|db), chosen once
+    configure_auth(app)
 
     # DB tables
-    Base.metadata.create_all(bind=engine)
+    _ensure_schema()
 
     # Routers
-    register_routes(app)                 # HTML pages (/dashboard, /contacts, /login, etc.)
-    app.include_router(contacts_api_router)  # JSON API (/api/contacts)
+    register_routes(app)  # HTML pages, /api/contacts and web push
+
+    # stable sort: routes sharing a path (GET/POST /login) keep their order
+    app.router.routes.sort(key=_route_priority)
 
     return app
 
@@ -7,36 +7,66 @@ def _pragma_table_info(conn, table: str) -> set[str]:
     # row tuple: (cid, name, type, notnull, dflt_value, pk)
     return {r[1] for r in rows}
 
-def _has_table(conn, table: str) -> bool:
-    r = conn.exec_driver_sql(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
-        (table,),
-    ).fetchone()
-    return bool(r)
+def _load_schema(conn) -> dict[str, set[str]]:
+    """All table names -> column names, read once per migration run."""
+    tables = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type='table'"
+    ).scalars().all()
+    return {t: _pragma_table_info(conn, t) for t in tables}
 
 def _add_column(conn, table: str, col_def_sql: str):
     # col_def_sql example: "mobile_bd VARCHAR(20)"
     conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {col_def_sql}")
 
-def _ensure_columns(conn, table: str, needed: Iterable[tuple[str, str]]):
-    if not _has_table(conn, table):
+def _ensure_indexes(conn, schema: dict[str, set[str]], table: str, ddls: Iterable[str]):
+    if table not in schema:
+        return
+    for ddl in ddls:
+        conn.exec_driver_sql(ddl)
+
+def _ensure_columns(conn, schema: dict[str, set[str]], table: str, needed: Iterable[tuple[str, str]]):
+    existing = schema.get(table)
+    if existing is None:
         return
-    existing = _pragma_table_info(conn, table)
     for name, ddl in needed:
         if name not in existing:
             _add_column(conn, table, f"{name} {ddl}")
+            existing.add(name)
+
+# Only settings stored in the database file belong here; per-connection
+# tuning is applied on connect in app/database.py. journal_mode=WAL cannot
+# be switched inside a transaction.
+STARTUP_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+)
+
+def _apply_pragmas(engine: Engine) -> None:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for pragma in STARTUP_PRAGMAS:
+            conn.exec_driver_sql(pragma)
+
+def optimize(engine: Engine, mask: int | None = None) -> None:
+    """PRAGMA optimize: re-ANALYZE only the tables whose stats went stale."""
+    if engine.url.get_backend_name() != "sqlite":
+        return
+    sql = "PRAGMA optimize" if mask is None else f"PRAGMA optimize({mask:#x})"
+    with engine.connect() as conn:
+        conn.exec_driver_sql(sql)
 
 def run_migrations(engine: Engine) -> None:
     """Idempotent, SQLite-only migrations. Safe to run at every startup."""
     if engine.url.get_backend_name() != "sqlite":
         return
 
+    _apply_pragmas(engine)
+
     with engine.begin() as conn:  # transactional
         # Make sure FK enforcement is on
         conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+        schema = _load_schema(conn)
 
         # ---- users table ----
-        _ensure_columns(conn, "users", [
+        _ensure_columns(conn, schema, "users", [
             ("mobile_bd", "VARCHAR(20)"),
             ("is_email_verified", "BOOLEAN DEFAULT 0"),
             ("created_at", "DATETIME"),
@@ -47,7 +77,7 @@ def run_migrations(engine: Engine) -> None:
         )
 
         # ---- coupons table ----
-        _ensure_columns(conn, "coupons", [
+        _ensure_columns(conn, schema, "coupons", [
             ("assigned_request_id", "INTEGER"),
             ("assigned_to_name", "VARCHAR(120)"),
             ("assigned_to_mobile", "VARCHAR(20)"),
@@ -62,7 +92,7 @@ def run_migrations(engine: Engine) -> None:
         )
 
         # ---- coupon_requests table ----
-        _ensure_columns(conn, "coupon_requests", [
+        _ensure_columns(conn, schema, "coupon_requests", [
             ("group_id", "INTEGER"),
             ("discount_percent", "INTEGER"),
             ("status", "VARCHAR(20) DEFAULT 'pending'"),
@@ -73,6 +103,29 @@ def run_migrations(engine: Engine) -> None:
         ])
 
         # ---- contacts table ----
-        _ensure_columns(conn, "contacts", [
+        _ensure_columns(conn, schema, "contacts", [
             ("notes", "TEXT"),
         ])
+
+        # ---- indexes for hot lookups ----
+        _ensure_indexes(conn, schema, "push_subscriptions", [
+            "CREATE INDEX IF NOT EXISTS ix_push_subs_user ON push_subscriptions(user_id)",
+        ])
+        _ensure_indexes(conn, schema, "users", [
+            "CREATE INDEX IF NOT EXISTS ix_users_role_active ON users(role, is_active)",
+        ])
+        _ensure_indexes(conn, schema, "coupon_requests", [
+            "CREATE INDEX IF NOT EXISTS ix_coupon_req_status_created "
+            "ON coupon_requests(status, created_at DESC)",
+        ])
+        # partial index: only the unassigned ("available") pool
+        _ensure_indexes(conn, schema, "coupons", [
+            "CREATE INDEX IF NOT EXISTS ix_coupons_group_active "
+            "ON coupons(group_id, is_active) WHERE assigned_request_id IS NULL",
+        ])
+
+        # let the planner see the new indexes right away
+        conn.exec_driver_sql("ANALYZE")
+
+    # 0x10000: look at every table, so sqlite_stat1 is filled on first boot
+    optimize(engine, 0x10002)
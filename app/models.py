@@ -1,13 +1,20 @@
 from datetime import datetime
 from enum import Enum
 from sqlalchemy import (
-    Integer, String, Boolean, DateTime, ForeignKey, Enum as SAEnum, Text, UniqueConstraint
+    Integer, String, Boolean, DateTime, ForeignKey, Enum as SAEnum, Text, UniqueConstraint, func
 )
 from sqlalchemy.orm import relationship, Mapped, mapped_column, synonym
 
 from app.database import Base
 
 
+# Timestamps carry both defaults: the Python one fills ORM/Core inserts
+# (tables created before server defaults existed have no DEFAULT clause,
+# and a server value would need a SELECT back after flush), the server
+# one covers raw SQL and bulk loads on new databases.
+_NOW = func.current_timestamp()
+
+
 class Role(str, Enum):
     SUPERADMIN = "superadmin"
     ADMIN = "admin"
@@ -31,7 +38,7 @@ class User(Base):
     role: Mapped[Role] = mapped_column(SAEnum(Role, native_enum=False), default=Role.CASHIER, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_email_verified: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=_NOW)
 
     requests_created = relationship(
         "CouponRequest", back_populates="cashier_user",
@@ -69,7 +76,7 @@ class Contact(Base):
     name: Mapped[str | None] = mapped_column(String(120), nullable=True)
 
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=_NOW)
 
 
 class CouponGroup(Base):
@@ -78,7 +85,7 @@ class CouponGroup(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
     percent: Mapped[int] = mapped_column(Integer, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=_NOW)
 
     coupons = relationship("Coupon", back_populates="group", cascade="all, delete-orphan")
 
@@ -89,7 +96,7 @@ class Coupon(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     code: Mapped[str] = mapped_column(String(80), unique=True, nullable=False)
     group_id: Mapped[int] = mapped_column(ForeignKey("coupon_groups.id"), nullable=False)
-    enlisted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    enlisted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=_NOW)
 
     assigned_request_id: Mapped[int | None] = mapped_column(ForeignKey("coupon_requests.id"), unique=True, nullable=True)
     assigned_to_name: Mapped[str | None] = mapped_column(String(120), nullable=True)
@@ -129,7 +136,7 @@ class CouponRequest(Base):
     group_id: Mapped[int | None] = mapped_column(ForeignKey("coupon_groups.id"), nullable=True)
     invoice_number: Mapped[str | None] = mapped_column(String(64), nullable=True)
 
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=_NOW)
     approved_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     done_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
@@ -152,7 +159,7 @@ class Setting(Base):
 
     key: Mapped[str] = mapped_column(String(100), primary_key=True)
     value: Mapped[str] = mapped_column(Text, nullable=False)
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=_NOW, onupdate=datetime.utcnow)
 
 
 class PushSubscription(Base):
@@ -163,6 +170,6 @@ class PushSubscription(Base):
     endpoint: Mapped[str] = mapped_column(Text, nullable=False)
     p256dh: Mapped[str] = mapped_column(Text, nullable=False)
     auth: Mapped[str] = mapped_column(Text, nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, server_default=_NOW)
 
     __table_args__ = (UniqueConstraint("endpoint", name="uq_push_endpoint"),)
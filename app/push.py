@@ -1,11 +1,28 @@
 import json
+from functools import lru_cache
+
 from sqlalchemy.orm import Session
-from pywebpush import webpush, WebPushException
 from app.config import settings
 from app.models import PushSubscription, User, Role
 
 
+@lru_cache(maxsize=1)
+def _http_session():
+    """One keep-alive HTTP session shared by all pushes (reuses TLS)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def _push(sub: PushSubscription, title: str, body: str, url: str | None = None):
+    # pywebpush pulls in cryptography; only pay for it when a push is sent
+    from pywebpush import webpush
+
     payload = {"title": title, "body": body}
     if url:
         payload["url"] = url
@@ -17,13 +34,15 @@ def _push(sub: PushSubscription, title: str, body: str, url: str | None = None):
         },
         data=json.dumps(payload),
         vapid_private_key=settings.VAPID_PRIVATE_KEY,
-        vapid_claims={"sub": settings.VAPID_EMAIL},
+        vapid_claims={"sub": settings.VAPID_SUBJECT},
         timeout=10,
+        requests_session=_http_session(),
     )
 
 
-def send_push_to_user(db: Session, user_id: int, title: str, body: str, url: str | None = None):
-    subs = db.query(PushSubscription).filter(PushSubscription.user_id == user_id).all()
+def _push_all(subs: list[PushSubscription], title: str, body: str, url: str | None = None):
+    from pywebpush import WebPushException
+
     for s in subs:
         try:
             _push(s, title, body, url=url)
@@ -32,7 +51,17 @@ def send_push_to_user(db: Session, user_id: int, title: str, body: str, url: str
             pass
 
 
+def send_push_to_user(db: Session, user_id: int, title: str, body: str, url: str | None = None):
+    subs = db.query(PushSubscription).filter(PushSubscription.user_id == user_id).all()
+    _push_all(subs, title, body, url=url)
+
+
 def send_push_to_role(db: Session, role: Role, title: str, body: str, url: str | None = None):
-    users = db.query(User).filter(User.role == role, User.is_active == True).all()
-    for u in users:
-        send_push_to_user(db, u.id, title, body, url=url)
+    # one query for every subscription of every active user in the role
+    subs = (
+        db.query(PushSubscription)
+        .join(User, User.id == PushSubscription.user_id)
+        .filter(User.role == role, User.is_active == True)
+        .all()
+    )
+    _push_all(subs, title, body, url=url)
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, Request, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, Form
 from fastapi.responses import PlainTextResponse, JSONResponse, HTMLResponse
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, upsert_insert
 from app.auth import require_login
 from app.models import PushSubscription
 
@@ -11,7 +11,7 @@ router = APIRouter()
 
 @router.get("/vapid_public_key", response_class=PlainTextResponse)
 def vapid_public_key() -> str:
-    return settings.vapid_public_key or ""
+    return settings.VAPID_PUBLIC_KEY or ""
 
 
 @router.get("/push/enable", response_class=HTMLResponse)
@@ -38,15 +38,21 @@ def push_subscribe(
     p256dh: str = Form(...),
     auth: str = Form(...),
 ):
-    # upsert per user+endpoint
-    row = db.query(PushSubscription).filter(PushSubscription.endpoint == endpoint).first()
-    if not row:
-        row = PushSubscription(user_id=user.id, endpoint=endpoint, p256dh=p256dh, auth=auth)
-        db.add(row)
-    else:
-        row.user_id = user.id
-        row.p256dh = p256dh
-        row.auth = auth
+    # session users are dicts; only database-backed logins carry an id
+    user_id = user.get("id")
+    if user_id is None:
+        raise HTTPException(status_code=403, detail="Push needs a database account")
+
+    # upsert per endpoint: one atomic statement instead of SELECT then write
+    stmt = (
+        upsert_insert(PushSubscription)
+        .values(user_id=user_id, endpoint=endpoint, p256dh=p256dh, auth=auth)
+        .on_conflict_do_update(
+            index_elements=["endpoint"],
+            set_={"user_id": user_id, "p256dh": p256dh, "auth": auth},
+        )
+    )
+    db.execute(stmt)
     db.commit()
     return {"ok": True}
 
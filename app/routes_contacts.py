@@ -1,71 +1,99 @@
 # app/routes_contacts.py
 from fastapi import APIRouter, HTTPException, Depends, status, Form, Request
 from sqlalchemy.orm import Session
-import re
 
-from .db import SessionLocal
+from .db import get_db, upsert_insert
 from .models import Contact
+from .utils import bump_contacts_total, contacts_page, contacts_total, is_valid_bd_mobile
 
 router = APIRouter(prefix="/api/contacts", tags=["contacts"])
 
-BD_REGEX = re.compile(r"^\+8801\d{9}$")  # 10 digits after +880
+# Column names differ between schema generations; resolve them once here
+# instead of inspecting the table on every request.
+_COLS = set(Contact.__table__.columns.keys())
+_NAME_COL = next((c for c in ("full_name", "name", "customer_name") if c in _COLS), "full_name")
+_MOBILE_COL = next((c for c in ("mobile", "mobile_bd", "phone") if c in _COLS), "mobile")
+_REMARK_COL = next((c for c in ("notes", "remarks", "remark", "note") if c in _COLS), "notes")
+# what the list views read; plain rows, no ORM objects to hydrate
+LIST_COLUMNS = (
+    Contact.id,
+    getattr(Contact, _NAME_COL).label("full_name"),
+    getattr(Contact, _MOBILE_COL).label("mobile"),
+    getattr(Contact, _REMARK_COL).label("remarks"),
+    Contact.created_at,
+)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def contact_kwargs(full_name: str, mobile: str, remark: str | None) -> dict:
+    return {_NAME_COL: full_name, _MOBILE_COL: mobile, _REMARK_COL: remark}
+
+
+def insert_contact(db: Session, full_name: str, mobile: str, remark: str | None) -> int | None:
+    """
+    Insert a contact in one statement; the unique index on mobile decides
+    duplicates. Returns the new id, or None if the mobile already exists.
+    """
+    stmt = (
+        upsert_insert(Contact)
+        .values(**contact_kwargs(full_name, mobile, remark))
+        .on_conflict_do_nothing(index_elements=[_MOBILE_COL])
+    )
+    result = db.execute(stmt)
+    db.commit()
+    if result.rowcount == 0:
+        return None
+    return result.inserted_primary_key[0]
+
+
+def _row_view(row) -> dict:
+    return {
+        "id": row.id,
+        "full_name": row.full_name,
+        "mobile": row.mobile,
+        "remarks": row.remarks or "",
+        "created_at": row.created_at.isoformat(),
+    }
 
 
 @router.get("")
-def list_contacts(page: int = 1, per_page: int = 10, db: Session = Depends(get_db)):
-    if page < 1:
-        page = 1
+def list_contacts(
+    request: Request,
+    after_id: int | None = None,
+    before_id: int | None = None,
+    per_page: int = 10,
+    db: Session = Depends(get_db),
+):
     if per_page < 1:
         per_page = 10
-    q = db.query(Contact)
-    total = q.count()
-    rows = (
-        q.order_by(Contact.id.desc())
-        .offset((page - 1) * per_page)
-        .limit(per_page)
-        .all()
-    )
-    data = [
-        {
-            "id": c.id,
-            "full_name": c.full_name,
-            "mobile": c.mobile,
-            "remarks": c.remarks or "",
-            "created_at": c.created_at.isoformat()
-        }
-        for c in rows
-    ]
-    return {"total": total, "page": page, "per_page": per_page, "rows": data}
+    rows, next_after_id, prev_before_id = contacts_page(db, LIST_COLUMNS, after_id, per_page, before_id)
+    data = [_row_view(c) for c in rows]
+    return {
+        "total": contacts_total(request, db),
+        "per_page": per_page,
+        "next_after_id": next_after_id,
+        "prev_before_id": prev_before_id,
+        "rows": data,
+    }
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
 def create_contact(
+    request: Request,
     full_name: str = Form(...),
     mobile: str = Form(...),
     remarks: str = Form(""),
     db: Session = Depends(get_db),
 ):
     mobile = mobile.strip()
-    if not BD_REGEX.match(mobile):
+    if not is_valid_bd_mobile(mobile):
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail="Invalid BD number. Use +8801XXXXXXXXX (10 digits after +880).",
         )
 
     # Enforce uniqueness by mobile
-    exists = db.query(Contact).filter(Contact.mobile == mobile).first()
-    if exists:
+    new_id = insert_contact(db, full_name.strip(), mobile, remarks.strip() or None)
+    if new_id is None:
         raise HTTPException(status_code=409, detail="Mobile already exists")
-
-    item = Contact(full_name=full_name.strip(), mobile=mobile, remarks=remarks.strip() or None)
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-    return {"id": item.id}
+    bump_contacts_total(request)
+    return {"id": new_id}
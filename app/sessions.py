@@ -0,0 +1,139 @@
+# app/sessions.py
+import time
+from base64 import b64decode, b64encode
+
+import itsdangerous
+import orjson
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
+
+
+class SessionDict(dict):
+    """
+    Session mapping that remembers whether it was modified. Writes that
+    do not change anything (same value, popping a missing key, clearing
+    an empty session) leave it clean, so the cookie is not re-signed.
+    In-place changes to nested values are not seen; reassign the key.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._dirty = False
+
+    def __setitem__(self, key, value):
+        if key in self and super().__getitem__(key) == value:
+            return
+        self._dirty = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._dirty = True
+
+    def clear(self):
+        if self:
+            self._dirty = True
+        super().clear()
+
+    def pop(self, key, *default):
+        if key in self:
+            self._dirty = True
+        return super().pop(key, *default)
+
+    def popitem(self):
+        item = super().popitem()
+        self._dirty = True
+        return item
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return super().__getitem__(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class PureASGISessionMiddleware:
+    """
+    Signed-cookie sessions implemented directly on the ASGI interface.
+    Cookies are compatible with starlette's SessionMiddleware, but the
+    Set-Cookie header is only emitted when the session was changed or the
+    cookie is past half its max_age. Expiry therefore stays sliding:
+    within max_age of the last activity, not of the login.
+    """
+
+    def __init__(
+        self,
+        app,
+        secret_key: str,
+        cookie_name: str = "session",
+        max_age: int | None = 14 * 24 * 60 * 60,
+        path: str = "/",
+        same_site: str = "lax",
+        https_only: bool = False,
+    ):
+        self.app = app
+        # signer (and its derived key) is built once, not per request
+        self.signer = itsdangerous.TimestampSigner(str(secret_key))
+        self.cookie_name = cookie_name
+        self.max_age = max_age
+        flags = f"path={path}; httponly; samesite={same_site}"
+        if https_only:
+            flags += "; secure"
+        self.security_flags = flags
+        self._cookie_key = cookie_name.encode("latin-1")
+
+    def _load(self, headers) -> SessionDict:
+        for name, value in headers:
+            if name != b"cookie":
+                continue
+            for part in value.split(b";"):
+                key, _, raw = part.strip().partition(b"=")
+                if key != self._cookie_key:
+                    continue
+                try:
+                    data, signed_at = self.signer.unsign(
+                        raw, max_age=self.max_age, return_timestamp=True
+                    )
+                    session = SessionDict(orjson.loads(b64decode(data)))
+                except (BadSignature, ValueError):
+                    return SessionDict()
+                # starlette re-signs on every response; re-signing once
+                # the cookie is half way to expiry keeps the same sliding
+                # window without a Set-Cookie per request
+                if self.max_age and time.time() - signed_at.timestamp() > self.max_age / 2:
+                    session._dirty = True
+                return session
+        return SessionDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        session = self._load(scope["headers"])
+        initial_session_was_empty = not session
+        scope["session"] = session
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and session._dirty:
+                headers = MutableHeaders(scope=message)
+                if session:
+                    data = b64encode(orjson.dumps(session))
+                    data = self.signer.sign(data).decode("utf-8")
+                    max_age = f"Max-Age={self.max_age}; " if self.max_age else ""
+                    headers.append(
+                        "Set-Cookie",
+                        f"{self.cookie_name}={data}; {max_age}{self.security_flags}",
+                    )
+                elif not initial_session_was_empty:
+                    headers.append(
+                        "Set-Cookie",
+                        f"{self.cookie_name}=null; Max-Age=0; "
+                        f"expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.security_flags}",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,19 +1,23 @@
 # app/utils.py
 from __future__ import annotations
 
+import base64
+import hashlib
+import hmac
 import os
-import re
+import time
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 
 from fastapi import Request
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from passlib.context import CryptContext
-from sqlalchemy import select
+from sqlalchemy import Integer, bindparam, cast, func, literal, select, true, union_all
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.models import User, CouponRequest, Role
+from app.models import Contact, User, CouponRequest, Role
 
 # -------------------------------------------------------------------
 # Password hashing / verification
@@ -21,19 +25,48 @@ from app.models import User, CouponRequest, Role
 # -------------------------------------------------------------------
 _pwd_ctx = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+# $pbkdf2-sha256$<rounds>$<salt>$<checksum> is computed with hashlib's
+# OpenSSL pbkdf2_hmac directly; passlib stays as the fallback verifier.
+_PBKDF2_PREFIX = "$pbkdf2-sha256$"
+_PBKDF2_ROUNDS = 29000  # passlib's default for pbkdf2_sha256
+_PBKDF2_SALT_BYTES = 16
+
+def _ab64_encode(data: bytes) -> str:
+    # passlib's "adapted base64": '.' instead of '+', no padding
+    return base64.b64encode(data).decode("ascii").rstrip("=").replace("+", ".")
+
+def _ab64_decode(text: str) -> bytes:
+    text = text.replace(".", "+")
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
 def hash_password(password: str) -> str:
-    return _pwd_ctx.hash(password)
+    salt = os.urandom(_PBKDF2_SALT_BYTES)
+    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, _PBKDF2_ROUNDS)
+    return f"{_PBKDF2_PREFIX}{_PBKDF2_ROUNDS}${_ab64_encode(salt)}${_ab64_encode(dk)}"
 
 def verify_password(password: str, hashed: str) -> bool:
     try:
+        if hashed.startswith(_PBKDF2_PREFIX):
+            rounds, salt, checksum = hashed[len(_PBKDF2_PREFIX):].split("$")
+            expected = _ab64_decode(checksum)
+            dk = hashlib.pbkdf2_hmac(
+                "sha256", password.encode("utf-8"), _ab64_decode(salt), int(rounds), len(expected)
+            )
+            return hmac.compare_digest(dk, expected)
         return _pwd_ctx.verify(password, hashed)
     except Exception:
         return False
 
+# Verified against when the login matches no user, so unknown and known
+# logins take the same time (no username enumeration via timing).
+_DUMMY_HASH = hash_password("not-a-real-password")
+
 # -------------------------------------------------------------------
 # Email verification tokens
 # -------------------------------------------------------------------
+@lru_cache(maxsize=1)
 def get_verification_serializer() -> URLSafeTimedSerializer:
+    # built once; the secret is fixed for the life of the process
     secret = getattr(settings, "SECRET_KEY", None) or os.getenv("SECRET_KEY", "change-this-secret")
     return URLSafeTimedSerializer(secret_key=secret, salt="email-verify")
 
@@ -68,31 +101,122 @@ def get_current_user(request: Request, db: Session) -> Optional[User]:
         return None
     return db.get(User, uid)
 
+# One statement, built once at import: each branch is a point lookup on
+# a unique index (unlike OR across the two columns); a username match
+# wins over an email match.
+_login_match = union_all(
+    select(User.id.label("id"), literal(0).label("rank")).where(User.username == bindparam("login")),
+    select(User.id.label("id"), literal(1).label("rank")).where(User.email == bindparam("login")),
+).subquery()
+_STMT_USER_BY_LOGIN = (
+    select(User)
+    .join(_login_match, _login_match.c.id == User.id)
+    .order_by(_login_match.c.rank)
+    .limit(1)
+)
+
+def authenticate_user(db: Session, login: str, password: str) -> Optional[User]:
+    """
+    Return the user matching username or email if the password is correct.
+    """
+    user = db.execute(_STMT_USER_BY_LOGIN, {"login": login}).scalar_one_or_none()
+    if not user:
+        verify_password(password, _DUMMY_HASH)
+        return None
+    if not verify_password(password, user.password_hash):
+        return None
+    return user
+
 def user_has_role(user: User, roles: list[Role]) -> bool:
     return user.role in roles
 
 # -------------------------------------------------------------------
 # Phone normalization (Bangladesh)
 # -------------------------------------------------------------------
+# deletes every Latin-1 character that is not a decimal digit
+_NON_DIGIT_TT = str.maketrans({c: None for c in map(chr, range(256)) if not c.isdecimal()})
+
 def normalize_bd_mobile(raw: str) -> str:
     """
     Normalize to +8801XXXXXXXXX. Accepts 01XXXXXXXXX, 8801XXXXXXXXX, +8801XXXXXXXXX.
     """
-    digits = re.sub(r"\D", "", raw or "")
-    if digits.startswith("8801") and len(digits) == 13:
-        rest = digits[3:]
-    elif digits.startswith("01") and len(digits) == 11:
-        rest = digits
-    elif len(digits) == 10 and digits.startswith("1"):
-        rest = "0" + digits
-    else:
-        if len(digits) >= 10 and digits[-10:].startswith("1"):
-            rest = "0" + digits[-10:]
-        else:
-            rest = digits
-    if rest.startswith("0"):
-        rest = rest[1:]
-    return "+880" + rest
+    digits = (raw or "").translate(_NON_DIGIT_TT)
+    if digits and not digits.isdecimal():
+        # non-Latin-1 input (e.g. Bengali digits); rare, take the slow path
+        digits = "".join(c for c in digits if c.isdecimal())
+    # Every accepted form (8801…, 01…, 1…, or anything longer) ends in the
+    # 10-digit subscriber number starting with 1, so one slice covers them.
+    tail = digits[-10:]
+    if len(tail) == 10 and tail[0] == "1":
+        return "+880" + tail
+    # not a recognisable mobile: pass the digits through, minus a trunk 0
+    return "+880" + (digits[1:] if digits[:1] == "0" else digits)
+
+def is_valid_bd_mobile(s: str) -> bool:
+    """True for "+8801" followed by exactly nine digits. No regex involved."""
+    return len(s) == 14 and s.startswith("+8801") and s[5:].isdecimal()
+
+# -------------------------------------------------------------------
+# Contacts listing (keyset pagination)
+# -------------------------------------------------------------------
+CONTACTS_TOTAL_TTL = 60  # seconds the displayed total may lag behind
+
+def contacts_page(
+    db: Session,
+    columns,
+    after_id: Optional[int],
+    per_page: int,
+    before_id: Optional[int] = None,
+) -> tuple[list, Optional[int], Optional[int]]:
+    """
+    Newest-first page of contacts, as rows of the given columns (which
+    must include Contact.id): the page older than after_id, or with
+    before_id the page just newer than it (all newest when neither).
+    Returns (rows, next_after_id, prev_before_id); each cursor is None
+    when there is nothing further that way.
+    Seeks on the primary key, so deep pages cost the same as the first.
+    """
+    if before_id:
+        # walk up from the cursor, then flip back to newest-first
+        rows = db.execute(
+            select(*columns)
+            .where(Contact.id > before_id)
+            .order_by(Contact.id.asc())
+            .limit(per_page + 1)
+        ).all()
+        has_newer = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        if not rows:
+            return rows, None, None
+        return rows, rows[-1].id, rows[0].id if has_newer else None
+
+    rows = db.execute(
+        select(*columns)
+        .where(Contact.id < after_id if after_id else true())
+        .order_by(Contact.id.desc())
+        .limit(per_page + 1)
+    ).all()
+    prev_before_id = rows[0].id if after_id and rows else None
+    if len(rows) > per_page:
+        return rows[:per_page], rows[per_page - 1].id, prev_before_id
+    return rows, None, prev_before_id
+
+def contacts_total(request: Request, db: Session) -> int:
+    """COUNT(*) of contacts, cached on app.state for CONTACTS_TOTAL_TTL."""
+    state = request.app.state
+    cached = getattr(state, "contacts_total", None)
+    now = time.monotonic()
+    if cached and cached[1] > now:
+        return cached[0]
+    total = db.scalar(select(func.count()).select_from(Contact))
+    state.contacts_total = (total, now + CONTACTS_TOTAL_TTL)
+    return total
+
+def bump_contacts_total(request: Request, delta: int = 1) -> None:
+    """Keep the cached total in step with a write instead of recounting."""
+    cached = getattr(request.app.state, "contacts_total", None)
+    if cached:
+        request.app.state.contacts_total = (cached[0] + delta, cached[1])
 
 # -------------------------------------------------------------------
 # Request code generator
@@ -105,18 +229,14 @@ def generate_request_code(db: Session, now: Optional[datetime] = None) -> str:
     yy = now.year % 100
     mm = now.month
     prefix = f"{yy:02d}-{mm:02d}"
-    last = db.execute(
-        select(CouponRequest.request_code)
-        .where(CouponRequest.request_code.like(f"{prefix}%"))
-        .order_by(CouponRequest.id.desc())
-        .limit(1)
-    ).scalar_one_or_none()
-    if last and last.startswith(prefix):
-        tail = last.replace(prefix, "")
-        try:
-            seq = int(tail) + 1
-        except ValueError:
-            seq = 1
-    else:
-        seq = 1
-    return f"{prefix}{seq:04d}"
+    # A range on request_code (unique, so indexed) instead of LIKE, which
+    # SQLite only turns into an index range for NOCASE columns. The max is
+    # numeric so the sequence keeps counting past 9999.
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    last_seq = db.execute(
+        select(func.max(cast(func.substr(CouponRequest.request_code, len(prefix) + 1), Integer)))
+        .where(CouponRequest.request_code >= prefix, CouponRequest.request_code < upper)
+    ).scalar()
+    # Two concurrent callers can still get the same code; the unique
+    # constraint on request_code rejects the second insert.
+    return f"{prefix}{(last_seq or 0) + 1:04d}"
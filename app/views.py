@@ -1,94 +1,197 @@
 # app/views.py
-from datetime import datetime
+import hashlib
+import threading
+from datetime import date
 from typing import Dict, Any
 
-from fastapi import FastAPI, Request, Form, Depends
-from fastapi.responses import RedirectResponse
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Request, Form, Depends
+from fastapi.responses import RedirectResponse, Response
 from fastapi.routing import APIRouter
-from sqlalchemy.orm import Session
-import re
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
 
-from .db import SessionLocal
-from .models import Contact
+from .auth import auth_router, current_user, login_required
+from .db import get_db
+from .models import CouponGroup, CouponRequest, RequestStatus, Role, User
+from .pwa import router as pwa_router
+from .routes_contacts import LIST_COLUMNS, insert_contact, router as contacts_api_router
+from .utils import bump_contacts_total, contacts_page as fetch_contacts_page, contacts_total, is_valid_bd_mobile
 
 router = APIRouter()
 
-BD_REGEX = re.compile(r"^\+8801\d{9}$")  # 10 digits after +880
+REQUESTS_LIST_LIMIT = 50
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_Cashier = aliased(User)
+_Reference = aliased(User)
+_Approver = aliased(User)
+
+# Latest requests for the dashboard table, as plain rows labelled the way
+# dashboard.html reads them.
+_STMT_LATEST_REQUESTS = (
+    select(
+        CouponRequest.id,
+        CouponRequest.request_code.label("code"),
+        CouponRequest.customer_name,
+        CouponRequest.customer_mobile,
+        CouponRequest.status,
+        _Cashier.username.label("cashier_name"),
+        _Reference.username.label("reference_name"),
+        _Approver.username.label("approved_name"),
+    )
+    .outerjoin(_Cashier, _Cashier.id == CouponRequest.cashier_user_id)
+    .outerjoin(_Reference, _Reference.id == CouponRequest.reference_user_id)
+    .outerjoin(_Approver, _Approver.id == CouponRequest.approved_by_user_id)
+    .order_by(CouponRequest.id.desc())
+    .limit(10)
+)
+
+# /requests rows: exactly the columns requests_list.html reads, with the
+# reference user's name joined in, so no ORM objects or relationship
+# loads per row.
+_STMT_REQUEST_LIST = (
+    select(
+        CouponRequest.id,
+        CouponRequest.request_code,
+        CouponRequest.customer_name,
+        CouponRequest.customer_mobile,
+        CouponRequest.discount_percent,
+        CouponRequest.status,
+        CouponRequest.reference_user_id,
+        _Reference.username.label("reference_name"),
+    )
+    .outerjoin(_Reference, _Reference.id == CouponRequest.reference_user_id)
+    .order_by(CouponRequest.id.desc())
+    # one row of lookahead: the template only links to an older page if it exists
+    .limit(REQUESTS_LIST_LIMIT + 1)
+)
+
+# Tiles and the latest list change on the scale of admin actions, while
+# many people keep the dashboard open; serve them from memory for a few
+# seconds. One entry, so memory use is fixed.
+DASHBOARD_TTL_SECONDS = 10
+_dashboard_cache: TTLCache = TTLCache(maxsize=1, ttl=DASHBOARD_TTL_SECONDS)
+# cachetools caches are not thread-safe and handlers run in a thread pool;
+# held only around cache access, never while querying
+_dashboard_lock = threading.Lock()
+
+# Coupon groups are edited rarely and listed on every /requests load;
+# keep (id, name, percent) rows rather than ORM objects bound to a session.
+GROUPS_TTL_SECONDS = 60
+_groups_cache: TTLCache = TTLCache(maxsize=1, ttl=GROUPS_TTL_SECONDS)
+_groups_lock = threading.Lock()
+_STMT_GROUPS = select(CouponGroup.id, CouponGroup.name, CouponGroup.percent).order_by(CouponGroup.percent)
 
 
 def render(request: Request, template_name: str, ctx: Dict[str, Any]) -> Any:
     base = {
         "request": request,
-        "current_year": datetime.utcnow().year,
-        "user": request.session.get("user"),
+        "user": current_user(request),
     }
     base.update(ctx or {})
     return request.app.state.templates.TemplateResponse(template_name, base)  # type: ignore[attr-defined]
 
 
-# ------------------ Auth ------------------
+# ------------------ Pages ------------------
 
-@router.get("/login")
-def login_page(request: Request, next: str = "/dashboard"):
-    return render(request, "login.html", {"next": next})
+@router.get("/")
+def root():
+    return RedirectResponse(url="/dashboard", status_code=303)
 
 
-@router.post("/login")
-def login_submit(request: Request, username: str = Form(...), password: str = Form(...), next: str = Form("/dashboard")):
-    """
-    Minimal demo login:
-    - In your real app, replace with proper authentication against your Users table.
-    """
-    # TODO: replace this stub with your real user/password check
-    if username and password:
-        request.session["user"] = username
-        return RedirectResponse(url=next or "/dashboard", status_code=303)
+def _dashboard_data(db: Session) -> Dict[str, Any]:
+    with _dashboard_lock:
+        cached = _dashboard_cache.get("data")
+    if cached is not None:
+        return cached
+    # all three tiles from one GROUP BY instead of a COUNT per status
+    counts = dict(
+        db.execute(
+            select(CouponRequest.status, func.count(CouponRequest.id))
+            .group_by(CouponRequest.status)
+        ).all()
+    )
+    rows = db.execute(_STMT_LATEST_REQUESTS).all()
+    data = {
+        "pending_cnt": counts.get(RequestStatus.PENDING, 0),
+        "approved_cnt": counts.get(RequestStatus.APPROVED, 0),
+        "done_cnt": counts.get(RequestStatus.DONE, 0),
+        "rows": rows,
+        # changes whenever anything the page shows from the db changes
+        "version": hashlib.blake2b(repr((sorted(counts.items()), rows)).encode(), digest_size=8).hexdigest(),
+    }
+    with _dashboard_lock:
+        _dashboard_cache["data"] = data
+    return data
 
-    # Fallback: reload form
-    return render(request, "login.html", {"next": next, "error": "Invalid credentials"})
 
+def invalidate_dashboard() -> None:
+    """Call after creating or changing a request so tiles update at once."""
+    with _dashboard_lock:
+        _dashboard_cache.clear()
 
-@router.get("/logout")
-def logout(request: Request):
-    request.session.clear()
-    return RedirectResponse(url="/login", status_code=303)
 
+def _coupon_groups(db: Session):
+    with _groups_lock:
+        groups = _groups_cache.get("groups")
+    if groups is None:
+        groups = db.execute(_STMT_GROUPS).all()
+        with _groups_lock:
+            _groups_cache["groups"] = groups
+    return groups
 
-# ------------------ Pages ------------------
 
-@router.get("/")
-def root():
-    return RedirectResponse(url="/dashboard", status_code=303)
+def invalidate_coupon_groups() -> None:
+    """Call after adding, editing or removing a coupon group."""
+    with _groups_lock:
+        _groups_cache.clear()
 
 
 @router.get("/dashboard")
-def dashboard(request: Request):
-    # Keep this lightweight; cards will show zero if there’s no data.
-    return render(request, "dashboard.html", {})
+def dashboard(request: Request, db: Session = Depends(get_db)):
+    redirect = login_required(request, "/dashboard")
+    if redirect:
+        return redirect
+
+    data = _dashboard_data(db)
+    # the page also shows the signed-in user's name and the footer year
+    user = current_user(request)
+    tag = f"{data['version']}|{user.get('username')}|{date.today().year}"
+    headers = {
+        "ETag": 'W/"%s"' % hashlib.blake2b(tag.encode(), digest_size=8).hexdigest(),
+        "Cache-Control": "private, max-age=5",
+    }
+    # refreshes of an unchanged dashboard skip rendering entirely
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    response = render(
+        request,
+        "dashboard.html",
+        {
+            **data,
+            "status_enum": True,  # rows carry RequestStatus members
+        },
+    )
+    response.headers.update(headers)
+    return response
 
 
 @router.get("/contacts")
-def contacts_page(request: Request, page: int = 1, per_page: int = 10, db: Session = Depends(get_db)):
+def contacts_page(
+    request: Request,
+    after_id: int | None = None,
+    before_id: int | None = None,
+    page: int = 1,  # display only (row numbers); the query seeks on the ids
+    per_page: int = 10,
+    db: Session = Depends(get_db),
+):
     if page < 1:
         page = 1
     if per_page < 1:
         per_page = 10
 
-    q = db.query(Contact)
-    total = q.count()
-    rows = (
-        q.order_by(Contact.id.desc())
-        .offset((page - 1) * per_page)
-        .limit(per_page)
-        .all()
-    )
+    rows, next_after_id, prev_before_id = fetch_contacts_page(db, LIST_COLUMNS, after_id, per_page, before_id)
 
     return render(
         request,
@@ -97,7 +200,9 @@ def contacts_page(request: Request, page: int = 1, per_page: int = 10, db: Sessi
             "rows": rows,
             "page": page,
             "per_page": per_page,
-            "total": total,
+            "total": contacts_total(request, db),
+            "next_after_id": next_after_id,
+            "prev_before_id": prev_before_id,
         },
     )
 
@@ -111,7 +216,7 @@ def contacts_create(
     db: Session = Depends(get_db),
 ):
     mobile = mobile.strip()
-    if not BD_REGEX.match(mobile):
+    if not is_valid_bd_mobile(mobile):
         # Reload the page with a message; your page JS already blocks bad inputs too
         return render(
             request,
@@ -119,32 +224,88 @@ def contacts_create(
             {
                 "page": 1,
                 "per_page": 10,
-                "total": db.query(Contact).count(),
+                "total": contacts_total(request, db),
                 "rows": [],
                 "error": "Please enter a valid BD number: +8801XXXXXXXXX (10 digits after +880).",
             },
         )
 
-    exists = db.query(Contact).filter(Contact.mobile == mobile).first()
-    if exists:
+    new_id = insert_contact(db, full_name.strip(), mobile, remarks.strip() or None)
+    if new_id is None:
         return render(
             request,
             "contacts.html",
             {
                 "page": 1,
                 "per_page": 10,
-                "total": db.query(Contact).count(),
+                "total": contacts_total(request, db),
                 "rows": [],
                 "error": "This mobile already exists.",
             },
         )
 
-    item = Contact(full_name=full_name.strip(), mobile=mobile, remarks=remarks.strip() or None)
-    db.add(item)
-    db.commit()
-
+    bump_contacts_total(request)
     return RedirectResponse(url="/contacts", status_code=303)
 
 
+@router.get("/requests")
+def requests_list(request: Request, before_id: int | None = None, db: Session = Depends(get_db)):
+    redirect = login_required(request, "/requests")
+    if redirect:
+        return redirect
+
+    # left as a result cursor: the template is rendered while the session
+    # is still open and only loops over it once, so rows are never
+    # collected into a list
+    stmt = _STMT_REQUEST_LIST
+    if before_id:
+        # keyset: older pages seek on the primary key instead of OFFSET
+        stmt = stmt.where(CouponRequest.id < before_id)
+    items = db.execute(stmt)
+    admins = db.execute(
+        select(User.id, User.username, User.role)
+        .where(User.role.in_((Role.ADMIN, Role.SUPERADMIN)), User.is_active == True)
+        .order_by(User.username)
+    ).all()
+    groups = _coupon_groups(db)
+
+    return render(
+        request,
+        "requests_list.html",
+        {
+            "items": items,
+            "admins": admins,
+            "groups": groups,
+            "current": current_user(request),
+            "page_size": REQUESTS_LIST_LIMIT,
+        },
+    )
+
+
+@router.get("/users")
+def users_page(request: Request, db: Session = Depends(get_db)):
+    redirect = login_required(request, "/users")
+    if redirect:
+        return redirect
+    # lists every user's email and mobile
+    if current_user(request).get("role") not in (Role.ADMIN.value, Role.SUPERADMIN.value):
+        raise HTTPException(status_code=403, detail="Admins only")
+
+    # dict-like rows keyed the way users.html reads them
+    users = db.execute(
+        select(
+            User.username,
+            User.email,
+            User.mobile_bd.label("mobile"),
+            User.role,
+            User.is_email_verified.label("email_verified"),
+        ).order_by(User.username)
+    ).mappings()
+    return render(request, "users.html", {"users": users})
+
+
 def register_routes(app: FastAPI) -> None:
+    app.include_router(auth_router)  # /login, /logout
     app.include_router(router)
+    app.include_router(contacts_api_router)  # JSON API (/api/contacts)
+    app.include_router(pwa_router)  # /vapid_public_key, /push/*